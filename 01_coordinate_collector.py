@@ -3,35 +3,431 @@
 # Descripción: Scripts automatizados para la recolección masiva de coordenadas geográficas
 #             de piscinas y áreas sin piscinas para la generación de datasets de entrenamiento
 
-import json
+from __future__ import annotations
+
+import orjson
 import os
 import re
+import sys
 import math
-from typing import List, Dict
+import struct
+from typing import List, Dict, TYPE_CHECKING
+from datetime import datetime
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+# NumPy y Numba se importan al primer uso para que el menú arranque al instante
+if TYPE_CHECKING:
+    import numpy as np
+
+# Patrón DMS completo (latitud y longitud), compilado una sola vez
+_DMS_RE = re.compile(r"(\d+)°(\d+)'(\d+)\"([NS])\s+(\d+)°(\d+)'(\d+)\"([EW])")
+
+# Detección de una entrada DMS completa en parse_coordinate_input (un solo fullmatch),
+# con "tipo" y "descripción" opcionales al final, igual que en el formato decimal
+_DETECT_RE = re.compile(
+    r"^\s*(?P<latd>\d+)°(?P<latm>\d+)'(?P<lats>\d+)\"(?P<latdir>[NS])"
+    r"\s+(?P<lond>\d+)°(?P<lonm>\d+)'(?P<lons>\d+)\"(?P<londir>[EW])"
+    r"(?:\s*,\s*(?P<type>[^,]*?)(?:\s*,\s*(?P<desc>.*?))?)?\s*$"
+)
+
+# Caracteres no permitidos en nombres de archivo derivados de la descripción
+_SLUG_RE = re.compile(r"[^\w.-]")
+
+EARTH_RADIUS_M = 6371000.0
+
+# Caché binario de coordinates.json: encabezado + registros (lat, lon, captured) empaquetados
+_CACHE_MAGIC = b"CCB1"
+_CACHE_HEADER = struct.Struct("<4sIIII")  # magic, n_pools, n_no_pools, len(metadata), len(textos)
+_CACHE_RECORD = [('lat', '<f8'), ('lon', '<f8'), ('cap', '?')]
+
+def _dms_groups_to_decimal(groups: tuple) -> tuple:
+    """Convierte los 8 grupos de coordenadas de _DMS_RE/_DETECT_RE a (lat, lon) decimal"""
+    lat_deg, lat_min, lat_sec, lat_dir, lon_deg, lon_min, lon_sec, lon_dir = groups
+    
+    lat_decimal = int(lat_deg) + (int(lat_min) / 60) + (int(lat_sec) / 3600)
+    if lat_dir == 'S':
+        lat_decimal = -lat_decimal
+    
+    lon_decimal = int(lon_deg) + (int(lon_min) / 60) + (int(lon_sec) / 3600)
+    if lon_dir == 'W':
+        lon_decimal = -lon_decimal
+    
+    return (lat_decimal, lon_decimal)
+
+def _make_slug(description: str, lat: float, lon: float) -> str:
+    """Nombre de archivo seguro (sin separadores de ruta ni espacios) para la coordenada"""
+    return _SLUG_RE.sub("_", description or f"Coord_{lat:.4f}_{lon:.4f}")[:64]
+
+def _canonical_type(coord_type: str) -> str:
+    """Normaliza los alias de tipo a 'pool' / 'no_pool'; '' si no es válido"""
+    coord_type = coord_type.strip().lower()
+    if coord_type in ['pool', 'piscina', 'p']:
+        return "pool"
+    if coord_type in ['no_pool', 'no_piscina', 'n']:
+        return "no_pool"
+    return ""
+
+def _unique_slug(slug: str, taken: set) -> str:
+    """Registra el slug en `taken`, agregando _2, _3, ... si ya lo usa otra coordenada"""
+    candidate, k = slug, 1
+    while candidate in taken:
+        k += 1
+        suffix = f"_{k}"
+        candidate = slug[:64 - len(suffix)] + suffix
+    taken.add(candidate)
+    return candidate
+
+def assign_slugs(records: List[Dict], taken: set):
+    """
+    Completa o corrige el "slug" de cada dict del JSON para que sea único entre todas
+    las coordenadas (también lo usa 02_mass_capture.py con JSON anteriores)
+    """
+    for r in records:
+        r["slug"] = _unique_slug(r.get("slug") or _make_slug(r["description"], r["lat"], r["lon"]), taken)
+
+@lru_cache(maxsize=None)
+def _latlon_validator():
+    """
+    Kernel Numba de validación, compilado en el primer uso; con cache=True las
+    siguientes ejecuciones lo cargan del caché en disco en lugar de recompilar
+    """
+    import numpy as np
+    from numba import njit, prange
+    
+    @njit(parallel=True, cache=True)
+    def _validate_latlon(arr):
+        """Valida rangos de un arreglo (N, 2) de (lat, lon); NaN se marca como inválido"""
+        n = arr.shape[0]
+        valid = np.empty(n, dtype=np.bool_)
+        for i in prange(n):
+            lat = arr[i, 0]
+            lon = arr[i, 1]
+            valid[i] = -90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0
+        return valid
+    
+    return _validate_latlon
+
+def _dms_rows_to_decimal(coord_strings: List[str]) -> np.ndarray:
+    """Parsea cadenas DMS a un arreglo (N, 2) de (lat, lon), sin validar ni avisar; inválidas en NaN"""
+    import numpy as np
+    n = len(coord_strings)
+    values = np.zeros((n, 6), dtype=np.int32)
+    south = np.zeros(n, dtype=bool)
+    west = np.zeros(n, dtype=bool)
+    valid = np.zeros(n, dtype=bool)
+    
+    for i, coord_string in enumerate(coord_strings):
+        match = _DMS_RE.match(coord_string.strip())
+        if match:
+            g = match.groups()
+            values[i] = (g[0], g[1], g[2], g[4], g[5], g[6])
+            south[i] = g[3] == 'S'
+            west[i] = g[7] == 'W'
+            valid[i] = True
+    
+    # Grados + minutos/60 + segundos/3600 para toda la columna a la vez
+    lat = values[:, 0] + values[:, 1] * (1 / 60) + values[:, 2] * (1 / 3600)
+    lon = values[:, 3] + values[:, 4] * (1 / 60) + values[:, 5] * (1 / 3600)
+    lat = np.where(south, -lat, lat)
+    lon = np.where(west, -lon, lon)
+    
+    result = np.column_stack((lat, lon))
+    result[~valid] = np.nan
+    return result
+
+def _decimal_rows(lines: List[str]) -> np.ndarray:
+    """Parsea líneas "lat, lon[, ...]" a un arreglo (N, 2), sin validar ni avisar; inválidas en NaN"""
+    import numpy as np
+    coords = np.full((len(lines), 2), np.nan, dtype=np.float64)
+    for i, line in enumerate(lines):
+        parts = line.split(',')
+        if len(parts) >= 2:
+            try:
+                coords[i, 0] = float(parts[0])
+                coords[i, 1] = float(parts[1])
+            except ValueError:
+                pass
+    return coords
+
+def _new_column(dtype: str) -> np.ndarray:
+    """Columna inicial del almacén"""
+    import numpy as np
+    return np.zeros(16, dtype=dtype)
+
+@dataclass
+class _PoolStore:
+    """
+    Almacén columnar (SoA) de coordenadas de un mismo tipo.
+    Los arreglos crecen por duplicación; solo las primeras `size` filas son válidas
+    """
+    lat: np.ndarray = field(default_factory=lambda: _new_column('f8'))
+    lon: np.ndarray = field(default_factory=lambda: _new_column('f8'))
+    captured: np.ndarray = field(default_factory=lambda: _new_column('?'))
+    descriptions: List[str] = field(default_factory=list)
+    slugs: List[str] = field(default_factory=list)
+    size: int = 0
+    # Slugs en uso, compartido entre los almacenes de piscinas y sin piscinas
+    taken: set = field(default_factory=set, repr=False)
+    
+    def __len__(self) -> int:
+        return self.size
+    
+    def _reserve(self, capacity: int):
+        """Garantiza capacidad para `capacity` filas (crecimiento amortizado)"""
+        import numpy as np
+        if capacity > len(self.lat):
+            new_capacity = max(capacity, 2 * len(self.lat))
+            self.lat = np.resize(self.lat, new_capacity)
+            self.lon = np.resize(self.lon, new_capacity)
+            self.captured = np.resize(self.captured, new_capacity)
+    
+    def append(self, lat: float, lon: float, description: str, captured: bool = False,
+               slug: str = None) -> str:
+        """Agrega una fila al final de los arreglos y retorna su slug"""
+        self._reserve(self.size + 1)
+        self.lat[self.size] = lat
+        self.lon[self.size] = lon
+        self.captured[self.size] = captured
+        self.descriptions.append(description)
+        self.slugs.append(_unique_slug(slug or _make_slug(description, lat, lon), self.taken))
+        self.size += 1
+        return self.slugs[-1]
+    
+    def extend(self, lat: np.ndarray, lon: np.ndarray, descriptions: List[str]) -> List[str]:
+        """Agrega un bloque de filas de una vez (np.concatenate) y retorna sus slugs"""
+        import numpy as np
+        n = self.size
+        slugs = [_unique_slug(_make_slug(d, la, lo), self.taken)
+                 for d, la, lo in zip(descriptions, lat.tolist(), lon.tolist())]
+        self.lat = np.concatenate((self.lat[:n], lat))
+        self.lon = np.concatenate((self.lon[:n], lon))
+        self.captured = np.concatenate((self.captured[:n], np.zeros(len(lat), dtype=bool)))
+        self.descriptions.extend(descriptions)
+        self.slugs.extend(slugs)
+        self.size = n + len(lat)
+        return slugs
+    
+    @classmethod
+    def from_records(cls, records: List[Dict], taken: set) -> "_PoolStore":
+        """Construye el almacén a partir de la lista de dicts del JSON"""
+        store = cls(taken=taken)
+        store._reserve(len(records))
+        n = len(records)
+        store.lat[:n] = [r["lat"] for r in records]
+        store.lon[:n] = [r["lon"] for r in records]
+        store.captured[:n] = [r.get("captured", False) for r in records]
+        store.descriptions = [r["description"] for r in records]
+        store.slugs = [_unique_slug(r.get("slug") or _make_slug(r["description"], r["lat"], r["lon"]), taken)
+                       for r in records]
+        store.size = n
+        return store
+    
+    @classmethod
+    def from_arrays(cls, records: np.ndarray, descriptions: List[str], slugs: List[str],
+                    taken: set) -> "_PoolStore":
+        """Construye el almacén a partir de registros del caché binario (copia los datos)"""
+        import numpy as np
+        return cls(lat=records['lat'].astype(np.float64), lon=records['lon'].astype(np.float64),
+                   captured=records['cap'].astype(bool), descriptions=descriptions,
+                   slugs=[_unique_slug(slug, taken) for slug in slugs], size=len(records),
+                   taken=taken)
+    
+    def to_cache_records(self) -> np.ndarray:
+        """Registros empaquetados (lat, lon, captured) para el caché binario"""
+        import numpy as np
+        records = np.empty(self.size, dtype=_CACHE_RECORD)
+        records['lat'] = self.lat[:self.size]
+        records['lon'] = self.lon[:self.size]
+        records['cap'] = self.captured[:self.size]
+        return records
+    
+    def keep(self, mask: np.ndarray):
+        """Conserva solo las filas donde `mask` es True"""
+        n = self.size
+        self.lat = self.lat[:n][mask]
+        self.lon = self.lon[:n][mask]
+        self.captured = self.captured[:n][mask]
+        keep = mask.tolist()
+        self.descriptions = [d for d, k in zip(self.descriptions, keep) if k]
+        self.slugs = [slug for slug, k in zip(self.slugs, keep) if k]
+        self.size = len(self.descriptions)
+    
+    def to_records(self) -> List[Dict]:
+        """Serializa al esquema del JSON (lista de dicts)"""
+        n = self.size
+        return [
+            {"lat": lat, "lon": lon, "description": description, "slug": slug, "captured": captured}
+            for lat, lon, description, slug, captured in zip(
+                self.lat[:n].tolist(), self.lon[:n].tolist(),
+                self.descriptions, self.slugs, self.captured[:n].tolist()
+            )
+        ]
+
+def _haversine_duplicates(lat: np.ndarray, lon: np.ndarray, radius_m: float,
+                          block: int = 1024) -> np.ndarray:
+    """
+    Marca las filas que están a menos de `radius_m` metros de una fila anterior conservada
+    (pasada voraz en orden: una fila descartada no descarta a las siguientes).
+    Haversine vectorizado por bloques de filas para acotar la memoria a block x N
+    """
+    import numpy as np
+    n = len(lat)
+    phi = np.radians(lat)
+    lam = np.radians(lon)
+    cos_phi = np.cos(phi)
+    # Umbral sobre a = sin²(Δφ/2) + cos φ1 cos φ2 sin²(Δλ/2), evita arcsin/sqrt por par
+    a_max = np.sin(radius_m / (2 * EARTH_RADIUS_M)) ** 2
+    
+    kept = np.zeros(n, dtype=bool)
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        d_phi = phi[start:stop, None] - phi[None, :stop]
+        d_lam = lam[start:stop, None] - lam[None, :stop]
+        a = (np.sin(d_phi / 2) ** 2
+             + cos_phi[start:stop, None] * cos_phi[None, :stop] * np.sin(d_lam / 2) ** 2)
+        # Solo cuentan las filas anteriores (j < i)
+        earlier = np.arange(stop)[None, :] < np.arange(start, stop)[:, None]
+        close = (a <= a_max) & earlier
+        
+        # Bloques anteriores: su estado ya es definitivo
+        duplicated = np.any(close[:, :start] & kept[None, :start], axis=1)
+        # Dentro del bloque el orden importa: primero las filas sin vecinos en el bloque,
+        # luego en orden las que sí tienen (sus vecinos j < i ya están resueltos)
+        inner = close[:, start:]
+        has_inner = inner.any(axis=1)
+        kept[start:stop] = ~duplicated & ~has_inner
+        for i in np.flatnonzero(has_inner & ~duplicated).tolist():
+            kept[start + i] = not np.any(inner[i] & kept[start:stop])
+    
+    return ~kept
 
 class CoordinateCollector:
     def __init__(self):
         self.coordinates_file = "scripts_automatizadores/coordinates.json"
-        self.coordinates = {
-            "pools": [],
-            "no_pools": [],
-            "metadata": {
-                "total_pools": 0,
-                "total_no_pools": 0,
-                "last_updated": ""
-            }
+        # Registro append-only de coordenadas agregadas desde la última compactación
+        self.log_file = "scripts_automatizadores/coordinates.jsonl"
+        # Caché binario para arranque rápido; el JSON sigue siendo la fuente de verdad
+        self.cache_file = "scripts_automatizadores/coordinates.bin"
+        self._log = None
+        self.pools = _PoolStore()
+        self.no_pools = _PoolStore(taken=self.pools.taken)
+        self.metadata = {
+            "total_pools": 0,
+            "total_no_pools": 0,
+            "last_updated": ""
         }
+        self._dirty = False
         self.load_existing()
     
     def load_existing(self):
         """Carga coordenadas existentes si el archivo existe"""
         if os.path.exists(self.coordinates_file):
             try:
-                with open(self.coordinates_file, 'r', encoding='utf-8') as f:
-                    self.coordinates = json.load(f)
-                print(f"✅ Cargadas {len(self.coordinates['pools'])} piscinas y {len(self.coordinates['no_pools'])} áreas sin piscinas")
+                if not (self._cache_is_fresh() and self._load_cache()):
+                    with open(self.coordinates_file, 'rb') as f:
+                        data = orjson.loads(f.read())
+                    taken = set()
+                    self.pools = _PoolStore.from_records(data["pools"], taken)
+                    self.no_pools = _PoolStore.from_records(data["no_pools"], taken)
+                    self.metadata = data.get("metadata", self.metadata)
+                    self._write_cache()
+                print(f"✅ Cargadas {len(self.pools)} piscinas y {len(self.no_pools)} áreas sin piscinas")
             except Exception as e:
                 print(f"⚠️ Error cargando archivo: {e}")
+        self._replay_log()
+    
+    def _cache_is_fresh(self) -> bool:
+        """El caché es válido solo si es más reciente que el JSON"""
+        if not os.path.exists(self.cache_file):
+            return False
+        return os.stat(self.cache_file).st_mtime_ns > os.stat(self.coordinates_file).st_mtime_ns
+    
+    def _load_cache(self) -> bool:
+        """Carga las coordenadas desde el caché binario con una sola lectura"""
+        import numpy as np
+        try:
+            with open(self.cache_file, 'rb') as f:
+                raw = f.read()
+            magic, n_pools, n_no_pools, meta_len, text_len = _CACHE_HEADER.unpack_from(raw)
+            if magic != _CACHE_MAGIC:
+                return False
+            
+            offset = _CACHE_HEADER.size
+            records = np.frombuffer(raw, dtype=_CACHE_RECORD, count=n_pools + n_no_pools, offset=offset)
+            offset += records.nbytes
+            metadata = orjson.loads(raw[offset:offset + meta_len])
+            offset += meta_len
+            texts = raw[offset:offset + text_len].decode('utf-8').split('\0') if text_len else []
+            
+            # Textos: descripciones de pools, de no_pools, luego slugs en el mismo orden
+            total = n_pools + n_no_pools
+            descriptions, slugs = texts[:total], texts[total:]
+            taken = set()
+            self.pools = _PoolStore.from_arrays(records[:n_pools], descriptions[:n_pools],
+                                                slugs[:n_pools], taken)
+            self.no_pools = _PoolStore.from_arrays(records[n_pools:], descriptions[n_pools:],
+                                                   slugs[n_pools:], taken)
+            self.metadata = metadata
+            return True
+        except Exception:
+            # Caché dañado o de otra versión: se vuelve a leer el JSON
+            return False
+    
+    def _write_cache(self):
+        """Regenera el caché binario con el estado que ya está en el JSON"""
+        import numpy as np
+        texts = (self.pools.descriptions + self.no_pools.descriptions
+                 + self.pools.slugs + self.no_pools.slugs)
+        if any('\0' in text for text in texts):
+            return
+        try:
+            records = np.concatenate((self.pools.to_cache_records(), self.no_pools.to_cache_records()))
+            meta = orjson.dumps(self.metadata)
+            text = '\0'.join(texts).encode('utf-8')
+            header = _CACHE_HEADER.pack(_CACHE_MAGIC, len(self.pools), len(self.no_pools), len(meta), len(text))
+            with open(self.cache_file, 'wb') as f:
+                f.write(header + records.tobytes() + meta + text)
+        except Exception as e:
+            print(f"⚠️ No se pudo escribir el caché binario: {e}")
+    
+    def _replay_log(self):
+        """Aplica las coordenadas del registro JSONL que aún no están en el JSON"""
+        if not os.path.exists(self.log_file):
+            return
+        
+        replayed = 0
+        with open(self.log_file, 'rb') as f:
+            for line in f:
+                try:
+                    entry = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    # Línea incompleta (p. ej. el programa se cerró a mitad de escritura)
+                    continue
+                store = self.pools if entry["type"] == "pool" else self.no_pools
+                store.append(entry["lat"], entry["lon"], entry["description"], slug=entry.get("slug"))
+                replayed += 1
+        
+        if replayed:
+            self._dirty = True
+            self.update_metadata()
+            print(f"♻️ Recuperadas {replayed} coordenadas del registro {self.log_file}")
+    
+    def _append_log(self, *entries: Dict):
+        """Agrega una línea por entrada al registro JSONL (se abre en la primera escritura)"""
+        if self._log is None:
+            self._log = open(self.log_file, 'a+b')
+            # Cerrar una línea incompleta de una sesión anterior para no pegarle la nueva entrada
+            if self._log.seek(0, os.SEEK_END):
+                self._log.seek(-1, os.SEEK_END)
+                if self._log.read(1) != b'\n':
+                    self._log.write(b'\n')
+        self._log.write(b''.join(orjson.dumps(entry) + b'\n' for entry in entries))
+    
+    def flush_log(self):
+        """Vacía el buffer del registro a disco (una vez por lote)"""
+        if self._log is not None:
+            self._log.flush()
     
     def convert_dms_to_decimal(self, coord_string: str) -> tuple:
         """
@@ -39,71 +435,112 @@ class CoordinateCollector:
         a formato decimal (19.1886, -96.1256)
         """
         try:
-            # Separar latitud y longitud
-            parts = coord_string.split()
-            
-            # Procesar latitud
-            lat_part = parts[0]  # 19°11'19"N
-            lat_match = re.match(r"(\d+)°(\d+)'(\d+)\"([NS])", lat_part)
-            
-            if lat_match:
-                lat_deg = int(lat_match.group(1))
-                lat_min = int(lat_match.group(2))
-                lat_sec = int(lat_match.group(3))
-                lat_dir = lat_match.group(4)
-                
-                lat_decimal = lat_deg + (lat_min / 60) + (lat_sec / 3600)
-                if lat_dir == 'S':
-                    lat_decimal = -lat_decimal
-            else:
-                raise ValueError("Formato de latitud incorrecto")
+            match = _DMS_RE.match(coord_string.strip())
+            if not match:
+                raise ValueError("Formato DMS incorrecto")
             
-            # Procesar longitud
-            lon_part = parts[1]  # 96°07'32"W
-            lon_match = re.match(r"(\d+)°(\d+)'(\d+)\"([EW])", lon_part)
-            
-            if lon_match:
-                lon_deg = int(lon_match.group(1))
-                lon_min = int(lon_match.group(2))
-                lon_sec = int(lon_match.group(3))
-                lon_dir = lon_match.group(4)
-                
-                lon_decimal = lon_deg + (lon_min / 60) + (lon_sec / 3600)
-                if lon_dir == 'W':
-                    lon_decimal = -lon_decimal
-            else:
-                raise ValueError("Formato de longitud incorrecto")
-            
-            return (lat_decimal, lon_decimal)
+            return _dms_groups_to_decimal(match.groups())
             
         except Exception as e:
             print(f"❌ Error convirtiendo coordenadas: {e}")
             return None
     
+    def convert_dms_batch(self, coord_strings: List[str]) -> np.ndarray:
+        """
+        Convierte una lista de coordenadas DMS a decimal en un solo paso.
+        Retorna un arreglo (N, 2) con (lat, lon); las filas inválidas quedan en NaN
+        """
+        import numpy as np
+        result = _dms_rows_to_decimal(coord_strings)
+        
+        invalid_count = int(np.isnan(result[:, 0]).sum())
+        if invalid_count:
+            print(f"⚠️ {invalid_count} coordenadas DMS con formato incorrecto")
+        
+        return result
+    
+    def parse_decimal_batch(self, lines: List[str]) -> tuple:
+        """
+        Parsea en lote líneas decimales "lat, lon[, tipo, descripción]" (p. ej. de un CSV).
+        Retorna: (arreglo (N, 2) con lat/lon, máscara booleana de filas válidas)
+        """
+        coords = _decimal_rows(lines)
+        valid = _latlon_validator()(coords)
+        
+        invalid_count = len(lines) - int(valid.sum())
+        if invalid_count:
+            print(f"⚠️ {invalid_count} coordenadas decimales inválidas o fuera de rango")
+        
+        return (coords, valid)
+    
+    def parse_bulk_lines(self, lines: List[str]) -> tuple:
+        """
+        Parsea en lote un bloque pegado: "lat, lon[, tipo, descripción]" o "DMS[, tipo, descripción]".
+        Retorna: (lat, lon, tipos, descripciones) solo con las filas válidas; tipo '' si no se indicó
+        """
+        import numpy as np
+        dms_rows, dms_coords = [], []
+        decimal_rows, decimal_lines = [], []
+        extras = []
+        for i, line in enumerate(lines):
+            parts = line.split(',')
+            if '°' in parts[0]:
+                dms_rows.append(i)
+                dms_coords.append(parts[0])
+                extras.append(parts[1:])
+            else:
+                decimal_rows.append(i)
+                decimal_lines.append(line)
+                extras.append(parts[2:])
+        
+        coords = np.full((len(lines), 2), np.nan, dtype=np.float64)
+        # Solo se parsea aquí: la validación y el aviso se hacen una vez para todo el bloque
+        if dms_coords:
+            coords[dms_rows] = _dms_rows_to_decimal(dms_coords)
+        if decimal_lines:
+            coords[decimal_rows] = _decimal_rows(decimal_lines)
+        valid = _latlon_validator()(coords)
+        
+        coord_types, descriptions = [], []
+        for (lat, lon), extra in zip(coords[valid].tolist(), [e for e, v in zip(extras, valid.tolist()) if v]):
+            coord_types.append(extra[0].strip() if extra else "")
+            description = extra[1].strip() if len(extra) > 1 else ""
+            descriptions.append(description or f"Coord_{lat:.4f}_{lon:.4f}")
+        
+        ignored = len(lines) - int(valid.sum())
+        if ignored:
+            print(f"⚠️ {ignored} líneas ignoradas por formato o rango inválido")
+        
+        return (coords[valid, 0], coords[valid, 1], coord_types, descriptions)
+    
     def parse_coordinate_input(self, user_input: str) -> tuple:
         """
         Parsea la entrada del usuario y detecta si es formato DMS o decimal
         Retorna: (lat, lon, coord_type, description) o None si hay error
         """
         try:
-            # Detectar si es formato DMS (contiene °, ', ")
-            if '°' in user_input and "'" in user_input and '"' in user_input:
-                # Es formato DMS, convertir primero
+            # Detectar formato DMS con un solo fullmatch y convertir desde sus grupos
+            dms_match = _DETECT_RE.fullmatch(user_input)
+            if dms_match:
                 print("🔄 Detectado formato DMS, convirtiendo...")
-                coords = self.convert_dms_to_decimal(user_input)
-                if coords:
-                    lat, lon = coords
-                    print(f"✅ Convertido: ({lat:.6f}, {lon:.6f})")
-                    
+                lat, lon = _dms_groups_to_decimal(dms_match.groups()[:8])
+                print(f"✅ Convertido: ({lat:.6f}, {lon:.6f})")
+                
+                if dms_match["type"]:
+                    # Formato completo: DMS, tipo[, descripción]
+                    coord_type = dms_match["type"]
+                    description = dms_match["desc"] or ""
+                else:
                     # Pedir tipo y descripción
                     coord_type = input("Tipo (pool/no_pool): ").strip()
                     description = input("Descripción (opcional): ").strip()
-                    if not description:
-                        description = f"Coord_{lat:.4f}_{lon:.4f}"
-                    
-                    return (lat, lon, coord_type, description)
-                else:
-                    return None
+                if not description:
+                    description = f"Coord_{lat:.4f}_{lon:.4f}"
+                
+                return (lat, lon, coord_type, description)
+            elif '°' in user_input:
+                print("❌ Error convirtiendo coordenadas: Formato DMS incorrecto")
+                return None
             else:
                 # Es formato decimal, verificar si tiene tipo y descripción
                 parts = user_input.split(',')
@@ -140,41 +577,121 @@ class CoordinateCollector:
     
     def add_coordinate(self, lat: float, lon: float, coord_type: str, description: str = ""):
         """Agrega una coordenada al tipo especificado"""
-        coord_data = {
-            "lat": lat,
-            "lon": lon,
-            "description": description,
-            "captured": False
-        }
-        
-        if coord_type.lower() in ['pool', 'piscina', 'p']:
-            self.coordinates["pools"].append(coord_data)
+        log_type = _canonical_type(coord_type)
+        if log_type == "pool":
+            slug = self.pools.append(lat, lon, description)
             print(f"✅ Piscina agregada: {description} en ({lat}, {lon})")
-        elif coord_type.lower() in ['no_pool', 'no_piscina', 'n']:
-            self.coordinates["no_pools"].append(coord_data)
+        elif log_type == "no_pool":
+            slug = self.no_pools.append(lat, lon, description)
             print(f"✅ Área sin piscina agregada: {description} en ({lat}, {lon})")
         else:
             print("❌ Tipo no válido. Usa 'pool' o 'no_pool'")
             return False
         
+        self._append_log({"type": log_type, "lat": lat, "lon": lon,
+                          "description": description, "slug": slug})
+        self._dirty = True
         self.update_metadata()
         return True
     
+    def add_coordinate_bulk(self, lat: np.ndarray, lon: np.ndarray, coord_type: str,
+                            descriptions: List[str]) -> int:
+        """Agrega un bloque de coordenadas del mismo tipo con una sola escritura al registro"""
+        log_type = _canonical_type(coord_type)
+        if log_type == "pool":
+            store = self.pools
+        elif log_type == "no_pool":
+            store = self.no_pools
+        else:
+            print(f"❌ Tipo no válido '{coord_type}' en {len(lat)} coordenadas. Usa 'pool' o 'no_pool'")
+            return 0
+        
+        slugs = store.extend(lat, lon, descriptions)
+        self._append_log(*(
+            {"type": log_type, "lat": la, "lon": lo, "description": d, "slug": slug}
+            for la, lo, d, slug in zip(lat.tolist(), lon.tolist(), descriptions, slugs)
+        ))
+        self.flush_log()
+        self._dirty = True
+        self.update_metadata()
+        
+        label = "piscinas" if log_type == "pool" else "áreas sin piscinas"
+        print(f"✅ {len(lat)} {label} agregadas en bloque")
+        return len(lat)
+    
+    def deduplicate(self, radius_m: float = 5.0) -> int:
+        """
+        Elimina coordenadas a menos de `radius_m` metros de otra anterior del mismo tipo,
+        para no pagar capturas repetidas del mismo punto. Retorna cuántas se eliminaron
+        """
+        removed = 0
+        for store in (self.pools, self.no_pools):
+            n = len(store)
+            if n < 2:
+                continue
+            duplicated = _haversine_duplicates(store.lat[:n], store.lon[:n], radius_m)
+            count = int(duplicated.sum())
+            if count:
+                store.keep(~duplicated)
+                removed += count
+        
+        print(f"🧹 {removed} coordenadas duplicadas eliminadas (radio {radius_m} m)")
+        if removed:
+            self._dirty = True
+            self.update_metadata()
+            # El registro JSONL aún contiene las filas eliminadas: compactar ya para
+            # que una recuperación tras un cierre inesperado no las restaure
+            self.save_coordinates()
+        return removed
+    
     def update_metadata(self):
-        """Actualiza los metadatos del archivo"""
-        from datetime import datetime
-        self.coordinates["metadata"]["total_pools"] = len(self.coordinates["pools"])
-        self.coordinates["metadata"]["total_no_pools"] = len(self.coordinates["no_pools"])
-        self.coordinates["metadata"]["last_updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        """Actualiza los totales de los metadatos (la fecha se asigna al guardar)"""
+        self.metadata["total_pools"] = len(self.pools)
+        self.metadata["total_no_pools"] = len(self.no_pools)
     
     def save_coordinates(self):
-        """Guarda las coordenadas en el archivo JSON"""
+        """Compacta todas las coordenadas en el archivo JSON y vacía el registro JSONL"""
         try:
-            with open(self.coordinates_file, 'w', encoding='utf-8') as f:
-                json.dump(self.coordinates, f, indent=2, ensure_ascii=False)
+            if self._dirty:
+                self.metadata["last_updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            coordinates = {
+                "pools": self.pools.to_records(),
+                "no_pools": self.no_pools.to_records(),
+                "metadata": self.metadata
+            }
+            with open(self.coordinates_file, 'wb') as f:
+                f.write(orjson.dumps(coordinates, option=orjson.OPT_INDENT_2))
+            self._dirty = False
+            self._write_cache()
+            
+            # El JSON ya contiene todo lo registrado: reiniciar el registro
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            if os.path.exists(self.log_file):
+                os.remove(self.log_file)
             print(f"💾 Coordenadas guardadas en {self.coordinates_file}")
-            print(f"📊 Total piscinas: {len(self.coordinates['pools'])}")
-            print(f"📊 Total sin piscinas: {len(self.coordinates['no_pools'])}")
+            print(f"📊 Total piscinas: {len(self.pools)}")
+            print(f"📊 Total sin piscinas: {len(self.no_pools)}")
+        except Exception as e:
+            print(f"❌ Error guardando: {e}")
+    
+    def _print_store(self, store: _PoolStore):
+        """Imprime las filas de un almacén recorriendo sus columnas"""
+        n = len(store)
+        for i, (description, lat, lon) in enumerate(
+                zip(store.descriptions, store.lat[:n].tolist(), store.lon[:n].tolist()), 1):
+            print(f"   {i:2d}. {description}")
+            print(f"       📍 ({lat:.6f}, {lon:.6f})")
+    
+    def save_log(self):
+        """Guarda de forma incremental: solo asegura en disco el registro JSONL"""
+        try:
+            self.flush_log()
+            print(f"💾 Coordenadas guardadas en {self.log_file}")
+            print(f"💡 Se compactarán en {self.coordinates_file} al escribir 'fin'")
+            print(f"📊 Total piscinas: {len(self.pools)}")
+            print(f"📊 Total sin piscinas: {len(self.no_pools)}")
         except Exception as e:
             print(f"❌ Error guardando: {e}")
     
@@ -183,26 +700,57 @@ class CoordinateCollector:
         print("\n📋 RESUMEN DE COORDENADAS")
         print("=" * 50)
         print("🌐 ESTADO ACTUAL DEL DATASET")
-        print(f"   Total de coordenadas configuradas: {len(self.coordinates['pools']) + len(self.coordinates['no_pools'])}")
+        print(f"   Total de coordenadas configuradas: {len(self.pools) + len(self.no_pools)}")
         print()
-        print(f"🏊 PISCINAS ({len(self.coordinates['pools'])}):")
-        if self.coordinates['pools']:
-            for i, pool in enumerate(self.coordinates['pools'], 1):
-                print(f"   {i:2d}. {pool['description']}")
-                print(f"       📍 ({pool['lat']:.6f}, {pool['lon']:.6f})")
+        print(f"🏊 PISCINAS ({len(self.pools)}):")
+        if len(self.pools):
+            self._print_store(self.pools)
         else:
             print("   ⚠️  No hay piscinas configuradas")
         
-        print(f"\n🏠 ÁREAS SIN PISCINAS ({len(self.coordinates['no_pools'])}):")
-        if self.coordinates['no_pools']:
-            for i, no_pool in enumerate(self.coordinates['no_pools'], 1):
-                print(f"   {i:2d}. {no_pool['description']}")
-                print(f"       📍 ({no_pool['lat']:.6f}, {no_pool['lon']:.6f})")
+        print(f"\n🏠 ÁREAS SIN PISCINAS ({len(self.no_pools)}):")
+        if len(self.no_pools):
+            self._print_store(self.no_pools)
         else:
             print("   ⚠️  No hay áreas sin piscinas configuradas")
         
         print("=" * 50)
 
+def bulk_paste(collector: CoordinateCollector):
+    """Modo 'pegar': lee varias líneas hasta una línea vacía y las inserta en bloque"""
+    import numpy as np
+    print("📋 Pega las coordenadas (una por línea) y termina con una línea vacía:")
+    lines = []
+    while True:
+        line = sys.stdin.readline()
+        if not line.strip():
+            break
+        lines.append(line.strip())
+    
+    if not lines:
+        print("⚠️ No se recibieron coordenadas")
+        return
+    
+    lat, lon, coord_types, descriptions = collector.parse_bulk_lines(lines)
+    if not len(lat):
+        return
+    
+    # Pedir el tipo una sola vez para las líneas que no lo indican
+    if not all(coord_types):
+        default_type = input("Tipo para las líneas sin tipo (pool/no_pool): ").strip()
+        coord_types = [t or default_type for t in coord_types]
+    
+    # Alias normalizados antes de agrupar: una sola inserción por tipo
+    coord_types = [_canonical_type(t) for t in coord_types]
+    invalid_count = coord_types.count("")
+    if invalid_count:
+        print(f"❌ {invalid_count} líneas con tipo no válido ignoradas. Usa 'pool' o 'no_pool'")
+    for coord_type in ("pool", "no_pool"):
+        mask = np.array([t == coord_type for t in coord_types])
+        if mask.any():
+            collector.add_coordinate_bulk(lat[mask], lon[mask], coord_type,
+                                          [d for d, k in zip(descriptions, mask.tolist()) if k])
+
 def interactive_collector():
     """Interfaz interactiva para recolectar coordenadas"""
     collector = CoordinateCollector()
@@ -222,7 +770,9 @@ def interactive_collector():
     print("🔍 COMANDOS DISPONIBLES:")
     print("   • 'fin' - Terminar y guardar")
     print("   • 'mostrar' - Ver resumen actual")
-    print("   • 'guardar' - Guardar coordenadas")
+    print("   • 'guardar' - Guardar en el registro .jsonl (el JSON se compacta con 'fin')")
+    print("   • 'depurar' - Eliminar coordenadas duplicadas (< 5 m)")
+    print("   • 'pegar' - Pegar varias coordenadas de una vez")
     print("   • 'ayuda' - Mostrar esta ayuda")
     print("=" * 60)
     
@@ -236,7 +786,13 @@ def interactive_collector():
             collector.show_summary()
             continue
         elif user_input.lower() == 'guardar':
-            collector.save_coordinates()
+            collector.save_log()
+            continue
+        elif user_input.lower() == 'depurar':
+            collector.deduplicate()
+            continue
+        elif user_input.lower() == 'pegar':
+            bulk_paste(collector)
             continue
         elif user_input.lower() == 'ayuda':
             print("\n📍 ENTRADA INTERACTIVA DE COORDENADAS")
@@ -254,7 +810,9 @@ def interactive_collector():
             print("🔍 COMANDOS DISPONIBLES:")
             print("   • 'fin' - Terminar y guardar")
             print("   • 'mostrar' - Ver resumen actual")
-            print("   • 'guardar' - Guardar coordenadas")
+            print("   • 'guardar' - Guardar en el registro .jsonl (el JSON se compacta con 'fin')")
+            print("   • 'depurar' - Eliminar coordenadas duplicadas (< 5 m)")
+            print("   • 'pegar' - Pegar varias coordenadas de una vez")
             print("   • 'ayuda' - Mostrar esta ayuda")
             print("=" * 60)
             continue
@@ -264,8 +822,9 @@ def interactive_collector():
         if result:
             lat, lon, coord_type, description = result
             collector.add_coordinate(lat, lon, coord_type, description)
+            collector.flush_log()
     
-    # Guardar al final
+    # Compactar el registro en el JSON al final
     collector.save_coordinates()
     print("\n✅ ¡Recolección completada!")
 